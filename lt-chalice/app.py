@@ -2,24 +2,48 @@
 App to 'rekognize' faces in images uploaded to an S3 bucket.
 """
 
-import json
-from logging import INFO
+from concurrent.futures import ThreadPoolExecutor
+from logging import DEBUG, INFO
 from os import environ
+from time import monotonic
 
 import boto3
+import orjson
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from chalice import Chalice
 
 app = Chalice(app_name='lt-chalice') # pylint: disable=C0103
 app.log.setLevel(INFO)
 
-PHONE_NUM_PARAM = environ['PHONE_NUM_PARAM']
-S3_BUCKET = environ['S3_BUCKET']
+try:
+    PHONE_NUM_PARAM = environ['PHONE_NUM_PARAM']
+    S3_BUCKET = environ['S3_BUCKET']
+except KeyError as err:
+    raise RuntimeError('Missing required environment variable {}; '
+                       'run manage_app.py to set it.'.format(err)) from err
+
+BOTO_CFG = Config(tcp_keepalive=True, max_pool_connections=50,
+                  retries={'max_attempts': 3, 'mode': 'standard'})
+
+_SESSION = boto3.session.Session()
+REK_CLIENT = _SESSION.client('rekognition', config=BOTO_CFG)
+SSM_CLIENT = _SESSION.client('ssm', config=BOTO_CFG)
+SNS_CLIENT = _SESSION.client('sns', config=BOTO_CFG)
+
+# Keep max_workers at or below BOTO_CFG's max_pool_connections
+_SNS_POOL = ThreadPoolExecutor(max_workers=10)
+
+_PHONE_NUM = None
+_PHONE_NUM_FETCHED_AT = 0.0
+_PHONE_NUM_TTL = 300
 
 @app.on_s3_event(bucket=S3_BUCKET, events=['s3:ObjectCreated:*'])
 def image_upload_handler(event):
     """Handle image upload events from S3 bucket."""
-    send_notification(recognize_faces(event))
+    face_details = recognize_faces(event)
+    if face_details:
+        send_notification(face_details)
 
 
 def recognize_faces(event):
@@ -32,17 +56,16 @@ def recognize_faces(event):
     result = []
 
     try:
-        rek_client = boto3.client('rekognition')
-
-        response = rek_client.detect_faces(Image={'S3Object':{'Bucket':event.bucket, \
-                'Name':event.key}}, Attributes=['ALL'])
+        response = REK_CLIENT.detect_faces(Image={'S3Object':{'Bucket':event.bucket, \
+                'Name':event.key}}, Attributes=['AGE_RANGE'])
 
         app.log.info('Detected %d face(s) for %s', len(response['FaceDetails']), event.key)
         for face_detail in response['FaceDetails']:
             app.log.info('The detected face is between %s and %s years old',
                          face_detail['AgeRange']['Low'], face_detail['AgeRange']['High'])
-            app.log.debug('Here are the other attributes:')
-            app.log.debug(json.dumps(face_detail, indent=4, sort_keys=True))
+            if app.log.isEnabledFor(DEBUG):
+                app.log.debug('Here are the other attributes:')
+                app.log.debug(orjson.dumps(face_detail).decode())
 
         result = response['FaceDetails']
 
@@ -52,26 +75,48 @@ def recognize_faces(event):
     return result
 
 
-def send_notification(face_details):
+def _format_message(face_detail):
+    """Return notification text for a single face."""
+    age_range = face_detail['AgeRange']
+    return f"The detected face is between {age_range['Low']} and {age_range['High']} years old"
+
+
+def _get_phone_number(_param=PHONE_NUM_PARAM, _ssm=SSM_CLIENT):
+    """Return phone number from SSM, cached for the life of a warm container."""
+    global _PHONE_NUM, _PHONE_NUM_FETCHED_AT # pylint: disable=W0603
+
+    now = monotonic()
+    if _PHONE_NUM is None or now - _PHONE_NUM_FETCHED_AT > _PHONE_NUM_TTL:
+        ssm_response = _ssm.get_parameter(Name=_param, WithDecryption=True)
+        _PHONE_NUM = ssm_response['Parameter']['Value']
+        _PHONE_NUM_FETCHED_AT = now
+
+    return _PHONE_NUM
+
+
+def send_notification(face_details, _sns=SNS_CLIENT, _pool=_SNS_POOL):
     """Send a text to a phone number."""
 
     result = {}
 
+    if not face_details:
+        return result
+
     try:
-        ssm_client = boto3.client('ssm')
-        ssm_response = ssm_client.get_parameter(Name=PHONE_NUM_PARAM, WithDecryption=True)
-        phone_num = ssm_response['Parameter']['Value']
+        phone_num = _get_phone_number()
     except ClientError as err:
         app.log.error('Unable to retreive phone number! %s', err)
         return result
 
     try:
-        sns_client = boto3.client('sns')
-
-        for face_detail in face_details:
-            message_text = 'The detected face is between {} and {} years old'.format(\
-                    face_detail['AgeRange']['Low'], face_detail['AgeRange']['High'])
-            result = sns_client.publish(Message=message_text, PhoneNumber=phone_num)
+        # PublishBatch only accepts a TopicArn, so direct-to-phone SMS has to be
+        # sent as one Publish call per message; fan those out instead.
+        responses = list(_pool.map(
+            lambda face_detail: _sns.publish(Message=_format_message(face_detail),
+                                             PhoneNumber=phone_num),
+            face_details))
+        if responses:
+            result = responses[-1]
     except ClientError as err:
         app.log.error('Unable to send notification! %s', err)
 
@@ -7,19 +7,39 @@ Manage lifecycle for the Chalice service integration lightning talk.
 import argparse
 import logging
 import logging.config
-from json import dump, dumps, loads
-from subprocess import CalledProcessError, run
-
-import yaml
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from json import dump
+from os import replace
+from subprocess import DEVNULL, PIPE, CalledProcessError, run
 
 import boto3
+import orjson
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+BOTO_CFG = Config(tcp_keepalive=True, max_pool_connections=50,
+                  retries={'max_attempts': 3, 'mode': 'standard'})
+
+
+def get_client(service):
+    """Return a client from its own session; the default session is not thread-safe."""
+    return boto3.session.Session().client(service, config=BOTO_CFG)
+
+
+def run_concurrently(*calls):
+    """Run (function, args...) tuples in parallel, re-raising the first failure."""
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        futures = [executor.submit(*call) for call in calls]
+        wait(futures)
+    for future in futures:
+        future.result()
+
 
 def create_s3_bucket(args):
     """Create S3 bucket."""
     try:
-        s3_client = boto3.client('s3')
+        s3_client = get_client('s3')
         s3_client.create_bucket(Bucket=args.s3_bucket,
                                 CreateBucketConfiguration={'LocationConstraint': args.region})
         logging.info('S3 bucket "%s" created', args.s3_bucket)
@@ -35,10 +55,14 @@ def create_s3_bucket(args):
 def delete_s3_bucket(args):
     """Delete S3 bucket."""
     try:
-        s3_resource = boto3.resource('s3')
-        bucket = s3_resource.Bucket(args.s3_bucket)
-        bucket.objects.all().delete()
-        bucket.delete()
+        s3_client = get_client('s3')
+        paginator = s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=args.s3_bucket):
+            keys = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+            if keys:
+                s3_client.delete_objects(Bucket=args.s3_bucket,
+                                         Delete={'Objects': keys, 'Quiet': True})
+        s3_client.delete_bucket(Bucket=args.s3_bucket)
         logging.info('S3 bucket "%s" deleted', args.s3_bucket)
     except ClientError as err:
         if err.response['Error']['Code'] == 'NoSuchBucket':
@@ -65,12 +89,13 @@ def get_ssm_param_userid(client, args):
     return user_id
 
 
+@lru_cache(maxsize=1)
 def get_current_user():
-    """Return current user."""
+    """Return current user (cached; the caller identity is fixed per process)."""
     user = 'lt-chalice-user'
 
     try:
-        sts_client = boto3.client('sts')
+        sts_client = get_client('sts')
         user = sts_client.get_caller_identity()['UserId']
     except ClientError as err:
         logging.warning('Unable to retrieve current user.  Defaulting to "%s". %s',
@@ -81,10 +106,9 @@ def get_current_user():
 
 def create_ssm_param(args):
     """Create SSM parameter."""
-    ssm_client = boto3.client('ssm')
+    ssm_client = get_client('ssm')
 
     current_user = get_current_user()
-    param_user = get_ssm_param_userid(ssm_client, args)
 
     try:
         ssm_client.put_parameter(Name=args.phone_num_name,
@@ -100,7 +124,7 @@ def create_ssm_param(args):
         logging.info('SSM parameter "%s" created', args.phone_num_name)
     except ClientError as err:
         if err.response['Error']['Code'] == 'ParameterAlreadyExists':
-            if current_user == param_user:
+            if current_user == get_ssm_param_userid(ssm_client, args):
                 ssm_client.put_parameter(Name=args.phone_num_name,
                                          Value=args.phone_num_value,
                                          Type='SecureString',
@@ -123,7 +147,7 @@ def create_ssm_param(args):
 
 def delete_ssm_param(args):
     """Delete SSM parameter."""
-    ssm_client = boto3.client('ssm')
+    ssm_client = get_client('ssm')
 
     current_user = get_current_user()
     param_user = get_ssm_param_userid(ssm_client, args)
@@ -146,7 +170,7 @@ def delete_ssm_param(args):
 def change_log_retention(group='/aws/lambda/lt-chalice-dev-image_upload_handler', days=1):
     """Modifies retention policy for log group lambda created."""
     try:
-        logs_client = boto3.client('logs')
+        logs_client = get_client('logs')
         logs_client.put_retention_policy(logGroupName=group, retentionInDays=days)
         logging.info('Log retention updated to %d day(s)', days)
     except ClientError as err:
@@ -156,11 +180,12 @@ def change_log_retention(group='/aws/lambda/lt-chalice-dev-image_upload_handler'
 
 def update_chalice_config(args, delete_flag=False):
     """Update config.json with values."""
+    config_path = '{}/.chalice/config.json'.format(args.chalice_app_dir)
     try:
         # Read config
-        with open('{}/.chalice/config.json'.format(args.chalice_app_dir), 'r') as config_fh:
-            config = loads(config_fh.read())
-        logging.debug('Chalice config before: %s', dumps(config))
+        with open(config_path, 'rb') as config_fh:
+            config = orjson.loads(config_fh.read())
+        logging.debug('Chalice config before: %s', config)
 
         # Add key
         if 'environment_variables' not in config:
@@ -174,11 +199,13 @@ def update_chalice_config(args, delete_flag=False):
             config['environment_variables']['PHONE_NUM_PARAM'] = args.phone_num_name
             config['environment_variables']['S3_BUCKET'] = args.s3_bucket
 
-        # Write config
-        with open('{}/.chalice/config.json'.format(args.chalice_app_dir), 'w') as config_fh:
+        # Write config atomically
+        tmp_path = '{}.tmp'.format(config_path)
+        with open(tmp_path, 'w') as config_fh:
             dump(config, config_fh, indent="\t")
             config_fh.write('\n')
-        logging.debug('Chalice config after: %s', dumps(config))
+        replace(tmp_path, config_path)
+        logging.debug('Chalice config after: %s', config)
     except Exception as err:
         logging.error('Unable to update Chalice config! %s', err)
         raise
@@ -188,13 +215,15 @@ def chalice_command(args, action='deploy'):
     """Manage the Chalice app."""
     logging.debug('action: %s', action)
     try:
+        log_output = logging.getLogger().isEnabledFor(logging.INFO)
         cmd_object = run(["chalice", action], cwd=args.chalice_app_dir,
-                         capture_output=True, text=True)
-        cmd_object.check_returncode()
+                         stdout=PIPE if log_output else DEVNULL, stderr=PIPE,
+                         text=True, check=True)
         logging.info('%s\n%s', action, cmd_object.stdout)
     except CalledProcessError as err:
-        logging.error(cmd_object.stderr)
-        logging.error(cmd_object.stdout)
+        logging.error(err.stderr)
+        if err.stdout:
+            logging.error(err.stdout)
         raise
     except Exception as err:
         logging.error('Unable to run Chalice command! %s', err)
@@ -204,9 +233,9 @@ def chalice_command(args, action='deploy'):
 def deploy(arguments):
     """Create resources required for Chalice demo."""
     logging.info('Deploying Chalice app...')
-    create_s3_bucket(arguments)
-    create_ssm_param(arguments)
-    update_chalice_config(arguments)
+    run_concurrently((create_s3_bucket, arguments),
+                     (create_ssm_param, arguments),
+                     (update_chalice_config, arguments))
     chalice_command(arguments)
     logging.info('Complete')
 
@@ -216,16 +245,19 @@ def delete(arguments):
     logging.info('Deleting Chalice app...')
     chalice_command(arguments, action='delete')
     update_chalice_config(arguments, delete_flag=True)
-    change_log_retention()
-    delete_ssm_param(arguments)
-    delete_s3_bucket(arguments)
+    run_concurrently((change_log_retention,),
+                     (delete_ssm_param, arguments),
+                     (delete_s3_bucket, arguments))
     logging.info('Complete')
 
 
+ACTIONS = {'deploy': deploy, 'delete': delete}
+
+
 def parse_arguments():
     """Parse arguments."""
     argparser = argparse.ArgumentParser()
-    argparser.add_argument('--action', required=True, choices=['deploy', 'delete'],
+    argparser.add_argument('--action', required=True, choices=list(ACTIONS),
                            help='deploy or delete')
     argparser.add_argument('--s3-bucket', required=True,
                            help='Name of S3 bucket for image uploads.')
@@ -242,11 +274,11 @@ def parse_arguments():
     return argparser.parse_args()
 
 
-def setup_logging(path='.manage_app.logging_config.yml', level=logging.INFO):
+def setup_logging(path='.manage_app.logging_config.json', level=logging.INFO):
     """Setup logging configuration."""
     try:
-        with open(path, 'rt') as logging_f:
-            config = yaml.safe_load(logging_f.read())
+        with open(path, 'rb') as logging_f:
+            config = orjson.loads(logging_f.read())
         logging.config.dictConfig(config)
     except (ValueError, TypeError, AttributeError, ImportError) as err:
         logging.basicConfig(level=level)
@@ -262,4 +294,4 @@ if __name__ == '__main__':
     ARGS = parse_arguments()
 
     # Call function corresopnding to action
-    locals()[ARGS.action](ARGS)
+    ACTIONS[ARGS.action](ARGS)